@@ -1,30 +1,41 @@
-def analyze_summarization_methods():
-    """Analyze and compare extractive and abstractive summarization methods."""
+import sys
+from types import MappingProxyType
+
+
+# Keys and phrases repeated across the analysis share one string object each.
+_K_ADV = sys.intern("advantages")
+_K_DIS = sys.intern("disadvantages")
+_EXTR = "Экстрактивный метод"
+_WHILE_ABSTR = "в то время как абстрактивный метод"
+
+
+def _build_template():
+    """Build the plain-dict comparison analysis."""
     return {
         "extractive_method": {
-            "advantages": [
+            _K_ADV: [
                 "показывает конкретные факты и детали из оригинального текста",
                 "помогает более точно передать информацию изначального текста"
             ],
-            "disadvantages": [
+            _K_DIS: [
                 "ограничен в выражении авторского стиля и тона",
                 "может упускать нюансы и индивидуальные толкования текста"
             ]
         },
         "abstractive_method": {
-            "advantages": [
+            _K_ADV: [
                 "позволяет выразить общее содержание текста в новой форме",
                 "создает более креативный и литературный подход к информации"
             ],
-            "disadvantages": [
+            _K_DIS: [
                 "может вносить субъективные интерпретации",
                 "требует большего понимания контекста для успешного создания резюме"
             ]
         },
         "comparison": {
             "key_differences": [
-                "Экстрактивный метод представляет факты и детали из текста, в то время как абстрактивный метод создает обобщенное представление текста",
-                "Экстрактивный метод более прямолинеен, в то время как абстрактивный метод более творческий"
+                f"{_EXTR} представляет факты и детали из текста, {_WHILE_ABSTR} создает обобщенное представление текста",
+                f"{_EXTR} более прямолинеен, {_WHILE_ABSTR} более творческий"
             ],
             "use_cases": {
                 "extractive_better_for": [
@@ -37,4 +48,68 @@ def analyze_summarization_methods():
                 ]
             }
         }
-    } 
\ No newline at end of file
+    }
+
+
+def _freeze(value):
+    """Recursively convert dicts to read-only mappings and lists to tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _build_json(template):
+    """Serialize the analysis to compact UTF-8 encoded JSON bytes."""
+    # Imported here so that importing this module stays as cheap as the original
+    try:
+        import orjson
+    except ImportError:
+        import json
+    else:
+        return orjson.dumps(template)
+    return json.dumps(template, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+_LAZY_BUILDERS = {
+    "_ANALYSIS_RESULT_MUTABLE_TEMPLATE": _build_template,
+    "_ANALYSIS_RESULT": lambda: _freeze(_lazy("_ANALYSIS_RESULT_MUTABLE_TEMPLATE")),
+    "_ANALYSIS_JSON": lambda: _build_json(_lazy("_ANALYSIS_RESULT_MUTABLE_TEMPLATE")),
+}
+
+
+def _lazy(name):
+    """Build a cached analysis object on first use and keep it in the module dict."""
+    try:
+        return globals()[name]
+    except KeyError:
+        value = globals()[name] = _LAZY_BUILDERS[name]()
+        return value
+
+
+def __getattr__(name):
+    if name in _LAZY_BUILDERS:
+        return _lazy(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def analyze_summarization_methods():
+    """Analyze and compare extractive and abstractive summarization methods.
+
+    Returns a shared read-only view; use analyze_summarization_methods_mutable()
+    if the result needs to be modified.
+    """
+    return _lazy("_ANALYSIS_RESULT")
+
+
+def analyze_summarization_methods_mutable():
+    """Return an independent, modifiable copy of the comparison analysis."""
+    import copy
+
+    return copy.deepcopy(_lazy("_ANALYSIS_RESULT_MUTABLE_TEMPLATE"))
+
+
+def analyze_summarization_methods_json():
+    """Return the comparison analysis as compact UTF-8 encoded JSON bytes."""
+    return _lazy("_ANALYSIS_JSON")
@@ -0,0 +1,40 @@
+"""Unit tests for final-round vote matching in userboard_pipeline.py."""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+import userboard_pipeline as pipeline  # noqa: E402
+
+FEATURES = [
+    pipeline.FeatureProposal(1, "Cap ads per hour", name="Ad cap"),
+    pipeline.FeatureProposal(2, "Add a sleep timer", name="Sleep timer"),
+    pipeline.FeatureProposal(3, "Fix offline downloads", name="Offline fix"),
+]
+
+
+@pytest.fixture(params=["automaton", "fallback"])
+def voted_feature(request, monkeypatch):
+    if request.param == "automaton":
+        pytest.importorskip("ahocorasick")
+    else:
+        monkeypatch.setitem(sys.modules, "ahocorasick", None)  # Forces the ImportError path
+    return pipeline._vote_matcher(FEATURES)
+
+
+def test_short_name_inside_other_words_is_not_a_vote(voted_feature):
+    assert voted_feature("A bad capability overall") is None
+
+
+def test_short_name_on_word_boundaries_is_a_vote(voted_feature):
+    assert voted_feature("I'd ship the ad cap.") == "Cap ads per hour"
+
+
+def test_first_mention_wins(voted_feature):
+    assert voted_feature("Sleep timer first, then the ad cap") == "Add a sleep timer"
+
+
+def test_full_description_still_matches(voted_feature):
+    assert voted_feature("Please fix offline downloads already") == "Fix offline downloads"
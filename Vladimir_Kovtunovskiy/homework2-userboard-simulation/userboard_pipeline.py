@@ -4,14 +4,15 @@ Multi-Agent User Board Simulation Pipeline
 This script orchestrates an end-to-end pipeline:
 1. Loads clustered user review data.
 2. Selects top clusters based on negative sentiment.
-3. Uses an LLM to ideate features addressing pains in selected clusters.
-4. Generates distinct user personas based on selected clusters using an LLM.
-5. Simulates a multi-round user board discussion using LLM agents representing personas.
-6. Summarizes the discussion using an LLM.
-7. Writes a final Markdown report.
+3. Uses a single LLM call to ideate features addressing pains in selected clusters
+   and to generate distinct user personas based on the same clusters (or, with
+   fuse_ideation_and_personas off, two separate calls running in parallel).
+4. Simulates a multi-round user board discussion using LLM agents representing personas.
+5. Summarizes the discussion using an LLM.
+6. Writes a final Markdown report.
 
 Setup:
-1. Ensure Python 3.9+ is installed.
+1. Ensure Python 3.10+ is installed.
 2. Create a virtual environment: `python -m venv .venv && source .venv/bin/activate`
 3. Install dependencies: `pip install -r requirements.txt` (Create this file!)
 4. Create a `.env` file in the same directory as the script with your `OPENAI_API_KEY="sk-..."`.
@@ -24,33 +25,40 @@ Outputs:
 """
 from __future__ import annotations
 
+import asyncio
+import functools
+import hashlib
+import heapq
 import json
 import logging
 import os
-import random
 import re
+import sqlite3
 import sys
+import threading
+import time
+import zlib
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List, Sequence, Tuple, TypedDict
+from typing import TYPE_CHECKING, Annotated, Any, Callable, Dict, Iterator, List, Literal, Sequence, Tuple, TypedDict
 
-import numpy as np # Added for seeding
+import orjson
 from dotenv import load_dotenv
-from langchain.schema import AIMessage, BaseMessage, HumanMessage, SystemMessage
-from langchain_community.callbacks.manager import get_openai_callback # Optional: for cost tracking
-from langchain_core.exceptions import LangChainException # For broader error catching
-from langchain_openai import ChatOpenAI
-from langgraph.graph import END, StateGraph
-from rich.logging import RichHandler
-# Added for retry logic
-from tenacity import retry, stop_after_attempt, wait_fixed
-from openai import APIError # Specific error type
-from langchain.chains import ConversationChain
-from langchain.memory import ConversationBufferWindowMemory
-from langchain_core.prompts import PromptTemplate # Use standard PromptTemplate
-from langchain.tools import Tool # Example tool import, might not be needed initially
-from collections import defaultdict # Added import
+# Message types make up the pipeline state (resolved by LangGraph at build time), so they
+# stay eager; langchain_core.messages is light next to the modules imported lazily below.
+from langchain_core.messages import (
+    BaseMessage, HumanMessage, SystemMessage, get_buffer_string, messages_to_dict,
+)
+from pydantic import BaseModel, TypeAdapter, ValidationError, field_validator
+from collections import Counter, defaultdict # Added import
+
+# Heavy dependencies (langchain_openai, langchain.memory, langgraph, tenacity, openai, rich)
+# are imported inside the functions that need them to keep cold-start time low.
+if TYPE_CHECKING:
+    from langchain.memory.chat_memory import BaseChatMemory
+    from langchain_openai import ChatOpenAI
 
 # --- Determine Project Root and Load Env ---
 SCRIPT_DIR = Path(__file__).parent.resolve()
@@ -75,15 +83,34 @@ class Config:
     # LLM - Use a valid OpenAI model name
     model_name: str = "gpt-4-turbo" # Example: Use a valid model
     temperature: float = 0.7
+    max_concurrency: int = 5 # Max in-flight LLM requests per round (keeps us under rate limits)
 
     # Simulation
     persona_count: int = 5
     feature_count: int = 3 # Define number of features to ideate
+    # One LLM call for features and personas; if False they are separate graph nodes run in parallel
+    fuse_ideation_and_personas: bool = True
     discussion_rounds: int = 3
-
-    # Determinism - Set to None to disable seeding
+    # Transcripts longer than this (in characters, ~4 per token) are summarised per persona first
+    summary_map_reduce_chars: int = 40_000
+    # "per_persona": one LLM call per persona turn.
+    # "batched": one LLM call per round answering for up to persona_batch_size personas at once.
+    # "single_pass": one LLM call per persona answering every round's facilitator prompt at once.
+    board_mode: str = "per_persona"
+    persona_batch_size: int = 6
+    # Persona memory: condense older turns into a rolling summary instead of replaying them verbatim
+    use_summary_memory: bool = True
+    summary_memory_token_limit: int = 400
+    memory_summary_model_name: str = "gpt-4o-mini" # Cheap model used only to condense history
+    memory_window: int = 2 # Turns kept verbatim when use_summary_memory is off
+
+    # Determinism - Set to None to disable seeding. Seeds np.random (speaking order) and the LLM clients.
     random_seed: int | None = 42
 
+    # On-disk LLM reply cache for repeated dev runs. Set LLM_CACHE=0 to disable.
+    llm_cache_enabled: bool = os.getenv("LLM_CACHE", "1") != "0"
+    cache_stochastic: bool = False # Also cache unseeded replies when temperature > 0
+
 
 CFG = Config()
 CFG.output_dir.mkdir(parents=True, exist_ok=True)
@@ -91,37 +118,57 @@ CFG.output_dir.mkdir(parents=True, exist_ok=True)
 # -----------------------------------------------------------------------------
 # Logging – pretty console + file
 # -----------------------------------------------------------------------------
-log_path = CFG.output_dir / "board_session.log"
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(module)s:%(lineno)d | %(message)s", # Added module/lineno
-    datefmt="%Y-%m-%d %H:%M:%S",
-    handlers=[RichHandler(rich_tracebacks=True, show_path=False), # show_path=False for cleaner console
-              logging.FileHandler(log_path, "w", "utf-8")],
-    force=True # Override root logger config if necessary
-)
-# Reduce verbosity of noisy libraries
-logging.getLogger("httpx").setLevel(logging.WARNING)
-logging.getLogger("openai").setLevel(logging.WARNING)
-
 logger = logging.getLogger(__name__) # Get logger for this module
-logger.info("Logging initialised. Log file: %s", log_path)
-logger.info("Using configuration: %s", CFG)
+
+
+def configure_logging() -> None:
+    """Sets up console + file logging. Called from main() so importing the module stays cheap."""
+    from rich.logging import RichHandler
+
+    log_path = CFG.output_dir / "board_session.log"
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(module)s:%(lineno)d | %(message)s", # Added module/lineno
+        datefmt="%Y-%m-%d %H:%M:%S",
+        handlers=[RichHandler(rich_tracebacks=True, show_path=False), # show_path=False for cleaner console
+                  logging.FileHandler(log_path, "w", "utf-8")],
+        force=True # Override root logger config if necessary
+    )
+    # Reduce verbosity of noisy libraries
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("openai").setLevel(logging.WARNING)
+
+    logger.info("Logging initialised. Log file: %s", log_path)
+    logger.info("Using configuration: %s", CFG)
 
 
 # -----------------------------------------------------------------------------
 # Utility Dataclasses & State Definition
 # -----------------------------------------------------------------------------
-@dataclass
+@dataclass(slots=True) # No per-instance __dict__
 class FeatureProposal:
     id: int
     description: str
+    name: str | None = None
+    rationale: str | None = None
 
     def md(self) -> str:
+        if self.name:
+            return f"{self.id}. {self.name}: {self.description}"
         return f"{self.id}. {self.description}"
 
 
-@dataclass
+# Shared by every persona agent; sent first so all personas' requests start with the same prefix,
+# which OpenAI's automatic prompt caching can reuse
+_BOARD_RULES = (
+    "You are a participant on a Spotify virtual user board, answering a facilitator's questions about candidate features. "
+    "Always speak in the first person ('I', 'me', 'my'). Keep your responses concise (1-3 sentences unless asked otherwise) and focused on the discussion topic. "
+    "Ground your opinions in your background and pain points. Be honest and natural. "
+    "Avoid clichés like 'Honestly' or 'Thanks for bringing this up'."
+)
+
+
+@dataclass(slots=True)
 class Persona:
     name: str
     background: str
@@ -132,15 +179,13 @@ class Persona:
 
     @property
     def system_prompt(self) -> str:
-        """Generates the system prompt for the LLM agent representing this persona."""
+        """Generates the persona-specific system prompt; the shared rules live in _BOARD_RULES."""
         pain_str = "; ".join(self.pain_points) # Use semicolon for clarity if needed
         return (
             f"You are {self.name}. Act and respond authentically based on this profile:\n"
             f"- Background: {self.background}\n"
             f"- Overall Sentiment towards Spotify: {self.sentiment}\n"
-            f"- Key Pain Points/Frustrations: {pain_str}\n"
-            f"Always speak in the first person ('I', 'me', 'my'). Keep your responses concise (1-3 sentences unless asked otherwise) and focused on the discussion topic. "
-            f"Ground your opinions in your background and pain points. Be honest and natural."
+            f"- Key Pain Points/Frustrations: {pain_str}"
         )
 
     def md(self) -> str:
@@ -155,54 +200,292 @@ class Persona:
         )
 
 
+class FeatureSchema(BaseModel):
+    """Shape of one feature object in the LLM's JSON, validated before building a FeatureProposal."""
+    name: str | None = None
+    description: str
+    rationale: str | None = None
+
+
+class PersonaSchema(BaseModel):
+    """Shape of one persona object in the LLM's JSON, validated before building a Persona."""
+    name: str
+    background: str
+    quote: str
+    sentiment: Literal["positive", "neutral", "negative"]
+    pain_points: List[str]
+    inspired_by_cluster_id: str | None = None
+
+    @field_validator("sentiment", mode="before")
+    @classmethod
+    def _lowercase_sentiment(cls, value: Any) -> Any:
+        return value.lower() if isinstance(value, str) else value
+
+    @field_validator("inspired_by_cluster_id", mode="before")
+    @classmethod
+    def _stringify_cluster_id(cls, value: Any) -> Any:
+        # LLMs often emit numeric cluster ids
+        return str(value) if isinstance(value, (int, float)) else value
+
+
+_PERSONA_LIST_ADAPTER = TypeAdapter(List[PersonaSchema])
+
+
+class TranscriptStream:
+    """Board transcript as Markdown lines.
+
+    Lines are written to the report one at a time instead of being joined into one large string.
+    """
+
+    def __init__(self) -> None:
+        self._lines: List[str] = []
+
+    def append(self, *lines: str) -> None:
+        self._lines.extend(lines)
+
+    def lines(self) -> Iterator[str]:
+        return iter(self._lines)
+
+    def __bool__(self) -> bool:
+        """True if the transcript has any non-blank content."""
+        return any(line.strip() for line in self._lines)
+
+
+def _merge_error(current: str | None, update: str | None) -> str | None:
+    """Keeps the first error when parallel nodes update the state in the same step."""
+    return current or update
+
+
 class AgentState(TypedDict):
     """Defines the state passed between graph nodes."""
     selected_clusters: Dict[str, dict]
     features: List[FeatureProposal]
     personas: List[Persona]
-    transcript: str # Markdown transcript
-    conversation_history: List[BaseMessage] # Structured message history
+    transcript: TranscriptStream # Markdown transcript lines
     summary: str
-    error: str | None # To capture errors in the graph
+    error: Annotated[str | None, _merge_error] # To capture errors in the graph
 
 
 # -----------------------------------------------------------------------------
-# Generic LLM wrapper with Retry Logic
+# Generic LLM wrapper with Retry Logic & Response Cache
 # -----------------------------------------------------------------------------
-LLM = ChatOpenAI(model=CFG.model_name, temperature=CFG.temperature)
+# Clients are created on first use; passing the seed makes provider sampling
+# (and therefore LLM_CACHE keys) reproducible.
+@functools.lru_cache(None)
+def _get_llm() -> ChatOpenAI:
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=CFG.model_name, temperature=CFG.temperature, seed=CFG.random_seed)
+
+
+@functools.lru_cache(None)
+def _get_memory_summary_llm() -> ChatOpenAI:
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(model=CFG.memory_summary_model_name, temperature=0, seed=CFG.random_seed)
+
+
+class LLMCache:
+    """Content-addressed SQLite cache of LLM replies, stored zlib-compressed.
+
+    The connection is opened on first use and shared across threads behind a lock,
+    since ask_llm also runs from worker threads.
+    """
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def cache_key(model: str, messages: Sequence[BaseMessage], temperature: float,
+                  seed: int | None = None) -> str:
+        """Hashes everything that determines the reply: model, sampling parameters and messages."""
+        payload = json.dumps(
+            {"model": model, "temp": temperature, "seed": seed, "messages": messages_to_dict(messages)},
+            sort_keys=True, ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value BLOB, ts INTEGER)")
+        return self._conn
+
+    def get(self, key: str) -> str | None:
+        try:
+            with self._lock:
+                row = self._connection().execute(
+                    "SELECT value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            return zlib.decompress(row[0]).decode("utf-8") if row else None
+        except (OSError, sqlite3.Error, zlib.error, UnicodeDecodeError) as e:
+            logger.warning("Ignoring unreadable LLM cache entry %s: %s", key[:12], e)
+            return None
+
+    def set(self, key: str, reply: str) -> None:
+        try:
+            with self._lock, self._connection() as conn: # Commits on success
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, ts) VALUES (?, ?, ?)",
+                    (key, zlib.compress(reply.encode("utf-8")), int(time.time())),
+                )
+        except (OSError, sqlite3.Error) as e:
+            logger.warning("Failed to write LLM cache entry %s: %s", key[:12], e)
+
+
+LLM_CACHE = LLMCache(CFG.output_dir / "llm_cache.sqlite")
+
+
+def _llm_cache_key(llm_client: ChatOpenAI, messages: Sequence[BaseMessage]) -> str | None:
+    """Returns the cache key for this request, or None if caching does not apply.
+
+    Sampled (temperature > 0) replies are only cached when the request is seeded,
+    so re-runs with CFG.random_seed set are served from the cache.
+    """
+    temperature = llm_client.temperature or 0
+    if not CFG.llm_cache_enabled:
+        return None
+    if temperature > 0 and llm_client.seed is None and not CFG.cache_stochastic:
+        return None
+    return LLMCache.cache_key(llm_client.model_name, messages, temperature, llm_client.seed)
+
+
+def _retry_policy() -> Dict[str, Any]:
+    """Retry settings shared by the sync and async LLM wrappers."""
+    from tenacity import stop_after_attempt, wait_fixed
+    return dict(
+        stop=stop_after_attempt(3), # Retry up to 3 times
+        wait=wait_fixed(2),         # Wait 2 seconds between retries
+        reraise=True,               # Re-raise the exception if all retries fail
+    )
+
 
-# Implement retry logic for LLM calls
-@retry(
-    stop=stop_after_attempt(3), # Retry up to 3 times
-    wait=wait_fixed(2),         # Wait 2 seconds between retries
-    reraise=True                # Re-raise the exception if all retries fail
-)
 def invoke_llm_with_retry(llm_client: ChatOpenAI, messages: List[BaseMessage]) -> str:
-    """Invokes the LLM with retry logic for transient errors."""
-    logger.debug("Invoking LLM with %d messages...", len(messages))
-    try:
-        # Optional: Track token usage and cost
-        # with get_openai_callback() as cb:
-        response = llm_client.invoke(messages)
-            # logger.debug("LLM call stats: %s", cb)
-        reply = response.content.strip()
-        logger.debug("LLM reply received (first 100 chars): %s", reply[:100])
-        return reply
-    except APIError as e:
-        logger.error("OpenAI API Error during LLM call: %s", e, exc_info=True)
-        raise # Let retry handle it or fail
-    except LangChainException as e:
-        logger.error("LangChain Error during LLM call: %s", e, exc_info=True)
-        raise # Let retry handle it or fail
-    except Exception as e:
-        logger.error("Unexpected error during LLM call: %s", e, exc_info=True)
-        raise # Let retry handle it or fail
+    """Invokes the LLM with retry logic for transient errors, serving repeats from LLM_CACHE."""
+    from langchain_core.exceptions import LangChainException # For broader error catching
+    from openai import APIError # Specific error type
+    from tenacity import Retrying
+
+    cache_key = _llm_cache_key(llm_client, messages)
+    if cache_key and (cached := LLM_CACHE.get(cache_key)) is not None:
+        logger.debug("LLM cache hit (%s)", cache_key[:12])
+        return cached
+
+    for attempt in Retrying(**_retry_policy()):
+        with attempt:
+            logger.debug("Invoking LLM with %d messages...", len(messages))
+            try:
+                response = llm_client.invoke(messages)
+                reply = response.content.strip()
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("LLM reply received (first 100 chars): %s", reply[:100])
+                if cache_key:
+                    LLM_CACHE.set(cache_key, reply)
+                return reply
+            except APIError as e:
+                logger.error("OpenAI API Error during LLM call: %s", e)
+                raise # Let retry handle it or fail
+            except LangChainException as e:
+                logger.error("LangChain Error during LLM call: %s", e)
+                raise # Let retry handle it or fail
+            except Exception as e:
+                logger.error("Unexpected error during LLM call: %s", e, exc_info=True)
+                raise # Let retry handle it or fail
+
+async def ainvoke_llm_with_retry(llm_client: ChatOpenAI, messages: List[BaseMessage]) -> str:
+    """Async counterpart of invoke_llm_with_retry, for running LLM calls concurrently."""
+    from langchain_core.exceptions import LangChainException
+    from openai import APIError
+    from tenacity import AsyncRetrying
+
+    cache_key = _llm_cache_key(llm_client, messages)
+    if cache_key and (cached := LLM_CACHE.get(cache_key)) is not None:
+        logger.debug("LLM cache hit (%s)", cache_key[:12])
+        return cached
+
+    async for attempt in AsyncRetrying(**_retry_policy()):
+        with attempt:
+            logger.debug("Invoking LLM asynchronously with %d messages...", len(messages))
+            try:
+                response = await llm_client.ainvoke(messages)
+                reply = response.content.strip()
+                if logger.isEnabledFor(logging.DEBUG):
+                    logger.debug("LLM reply received (first 100 chars): %s", reply[:100])
+                if cache_key:
+                    LLM_CACHE.set(cache_key, reply)
+                return reply
+            except APIError as e:
+                logger.error("OpenAI API Error during async LLM call: %s", e)
+                raise
+            except LangChainException as e:
+                logger.error("LangChain Error during async LLM call: %s", e)
+                raise
+            except Exception as e:
+                logger.error("Unexpected error during async LLM call: %s", e, exc_info=True)
+                raise
+
+
+# OpenAI caches matching prompt prefixes automatically, so static content just has to come first.
+def build_messages(static_blocks: Sequence[str], dynamic: Sequence[BaseMessage]) -> List[BaseMessage]:
+    """Orders messages as [static system blocks..., dynamic messages...] so the static prefix is cacheable."""
+    return [SystemMessage(content=block) for block in static_blocks] + list(dynamic)
+
+
+def ask_llm(prompt: str, system_prompt: str | None = None) -> str:
+    """Synchronous LLM call using the retry wrapper.
+
+    `system_prompt` should hold the static part of the request; `prompt` the part that varies.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("ask_llm prompt (first 200 chars): %s%s", prompt[:200], "…" if len(prompt) > 200 else "")
+    static_blocks = [system_prompt] if system_prompt else []
+    # Use the shared LLM client
+    return invoke_llm_with_retry(_get_llm(), build_messages(static_blocks, [HumanMessage(content=prompt)]))
+
+
+async def aask_llm(prompt: str, system_prompt: str | None = None) -> str:
+    """Async counterpart of ask_llm, for issuing independent prompts concurrently."""
+    static_blocks = [system_prompt] if system_prompt else []
+    return await ainvoke_llm_with_retry(_get_llm(), build_messages(static_blocks, [HumanMessage(content=prompt)]))
+
+_JSON_BLOCK = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL)
+_JSON_OPENER = re.compile(r"[\[{]")
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _extract_json(raw_response: str, expected: type | None = None) -> Any:
+    """Parses the first valid JSON array/object in an LLM reply, tolerating code fences and surrounding prose.
+
+    Every '[' / '{' is tried in order until one decodes. Pass `expected` (list or dict) to also
+    skip values of the other type, so bracketed prose like "[3]" is not taken for the payload.
+    """
+    match = _JSON_BLOCK.search(raw_response)
+    candidates = [match.group(1), raw_response] if match else [raw_response]
+    for candidate in candidates:
+        for opener in _JSON_OPENER.finditer(candidate):
+            try:
+                value, _ = _JSON_DECODER.raw_decode(candidate, opener.start())
+            except json.JSONDecodeError:
+                continue
+            if expected is None or isinstance(value, expected):
+                return value
+    kind = {list: "array", dict: "object"}.get(expected, "array or object")
+    raise json.JSONDecodeError(f"No valid JSON {kind} found", raw_response, 0)
 
-def ask_llm(prompt: str) -> str:
-    """Synchronous LLM call using the retry wrapper."""
-    logger.debug("ask_llm prompt (first 200 chars): %s", prompt[:200] + ("…" if len(prompt) > 200 else ""))
-    # Use the global LLM client
-    return invoke_llm_with_retry(LLM, [HumanMessage(content=prompt)])
+
+def parse_llm_json(raw_response: str, expected: type | None = None) -> Any:
+    """Parses JSON from an LLM reply, making one cheap repair call if it is malformed.
+
+    The repair prompt only carries the broken output, which is much cheaper than
+    re-running the original prompt with all of its context.
+    """
+    try:
+        return _extract_json(raw_response, expected)
+    except json.JSONDecodeError as e:
+        logger.warning("LLM returned malformed JSON (%s). Attempting one repair pass.", e)
+    repaired = ask_llm("Fix this JSON so it parses; return only JSON:\n" + raw_response)
+    return _extract_json(repaired, expected)
 
 # -----------------------------------------------------------------------------
 # 1) Read & validate cluster JSON
@@ -216,9 +499,9 @@ def load_cluster_data(path: Path) -> Dict[str, dict]:
         raise FileNotFoundError(f"Cluster JSON file not found: {path}")
 
     try:
-        with path.open(encoding="utf-8") as f:
-            loaded_data = json.load(f)
-    except json.JSONDecodeError as e:
+        # orjson parses straight from bytes, much faster than the stdlib decoder on large dumps
+        loaded_data = orjson.loads(path.read_bytes())
+    except orjson.JSONDecodeError as e:
         logger.error("Failed to decode JSON from %s: %s", path, e)
         raise ValueError(f"Invalid JSON file: {path}") from e
     except Exception as e:
@@ -256,21 +539,22 @@ def pick_top_clusters(clusters: Dict[str, dict], k: int) -> Dict[str, dict]:
     if k <= 0:
         return {}
     try:
+        # Partial selection: O(n log k) instead of sorting every cluster.
         # Ensure robustness if sentiment_dist or negative key is missing
-        ranked = sorted(
+        ranked = heapq.nlargest(
+            k,
             clusters.items(),
             key=lambda kv: kv[1].get('sentiment_dist', {}).get("negative", 0) if isinstance(kv[1], dict) else 0,
-            reverse=True,
         )
     except Exception as e:
         logger.error("Error sorting clusters: %s. Check cluster data format.", e, exc_info=True)
         raise TypeError("Cluster data format seems incompatible for sorting.") from e
 
-    num_to_select = min(k, len(ranked))
+    num_to_select = len(ranked)
     if num_to_select < k:
         logger.warning("Requested %d clusters, but only %d available after ranking.", k, num_to_select)
 
-    selected = dict(ranked[:num_to_select])
+    selected = dict(ranked)
     logger.info("Selected top %d clusters for ideation: %s", len(selected), list(selected.keys()))
     return selected
 
@@ -278,141 +562,118 @@ def pick_top_clusters(clusters: Dict[str, dict], k: int) -> Dict[str, dict]:
 # 2) Feature Ideation
 # -----------------------------------------------------------------------------
 
-def ideate_features(selected: Dict[str, dict], n: int = CFG.feature_count) -> List[FeatureProposal]:
-    """Generates feature proposals based on selected clusters using an LLM."""
-    logger.info("Starting feature ideation for %d features...", n)
-    if not selected:
-        logger.warning("No clusters selected for feature ideation.")
-        return []
-
+def _format_cluster_details(clusters: Dict[str, dict]) -> str:
+    """Renders one summary line per cluster, shared by the ideation and persona prompts."""
     cluster_details = []
-    for cid, info in selected.items():
+    for cluster_id, cluster_data in clusters.items():
         # Basic validation of cluster info structure
-        if not isinstance(info, dict):
-            logger.warning("Skipping cluster '%s' in ideation prompt due to unexpected format: %s", cid, type(info))
+        if not isinstance(cluster_data, dict):
+            logger.warning("Skipping cluster '%s' in prompt due to unexpected format: %s", cluster_id, type(cluster_data))
             continue
 
-        keywords = ', '.join(info.get('keywords', ['N/A']))
-        neg_sentiment = info.get('sentiment_dist', {}).get('negative', 0)
-        samples = info.get('samples', [])
+        keywords_str = ", ".join(cluster_data.get('keywords', ['N/A']))
+        sentiment_dist = cluster_data.get('sentiment_dist', {})
+        samples = cluster_data.get('samples', [])
         sample_feedback = samples[0] if samples else 'N/A'
+        sentiment_info = f"SentimentDist=[{', '.join(f'{k}: {v}' for k, v in sentiment_dist.items())}]"
+        if 'avg_sentiment' in cluster_data:
+             sentiment_info += f" | AvgSentiment={cluster_data['avg_sentiment']:.2f}"
 
         cluster_details.append(
-            f"- **Cluster {cid}**:\n"
-            f"  - Keywords: {keywords}\n"
-            f"  - Negative Sentiment Count: {neg_sentiment}\n"
-            f"  - Sample Feedback: '{sample_feedback[:200]}...'") # Limit sample length
+            f'- Cluster {cluster_id}: Keywords=[{keywords_str}] | {sentiment_info} | Sample="{sample_feedback[:200]}..."'
+        ) # Limit sample length
 
-    if not cluster_details:
-        logger.error("No valid cluster details could be extracted for the feature ideation prompt.")
-        return []
+    return "\n".join(cluster_details)
 
-    cluster_str = "\n".join(cluster_details)
 
-    prompt = (
-        f"You are a Senior Product Manager at Spotify, specializing in user experience. "
-        f"Your task is to propose exactly {n} concrete and realistic product features or UX improvements "
-        f"that directly address the pain points highlighted in the following user feedback clusters. "
-        f"Focus on actionable solutions that enhance user satisfaction.\n\n"
-        f"**User Feedback Clusters:**\n"
-        f"{cluster_str}\n\n"
-        f"**Instructions:**\n"
-        f"1. Generate exactly {n} distinct feature proposals.\n"
-        f"2. Each proposal should be a clear, concise imperative statement (e.g., 'Implement a sleep timer', 'Improve playlist organization').\n"
-        f"3. Ensure the features directly relate to the pain points identified in the cluster keywords and sample feedback.\n"
-        f"4. Return EACH proposal on a new line, with NO prefixes (like numbers or dashes) and NO blank lines between proposals.\n\n"
-        f"**Example Output Format:**\n"
-        f"Allow collaborative playlist editing in real-time\n"
-        f"Introduce higher fidelity audio options for subscribers\n"
-        f"Simplify the podcast discovery interface"
-    )
-    # REMOVED print(prompt) - Rely on debug logging in ask_llm
+def _validate_features(parsed: Any, n: int) -> List[FeatureProposal]:
+    """Turns the feature objects returned by the LLM into at most `n` distinct FeatureProposals."""
+    if not isinstance(parsed, list):
+        logger.warning("Expected a list of feature proposals, got %s.", type(parsed).__name__)
+        return []
 
-    try:
-        raw = ask_llm(prompt)
-        # REMOVED print(raw) - Rely on debug logging in ask_llm
+    features: List[FeatureSchema] = []
+    seen = set()
+    for i, item in enumerate(parsed):
+        try:
+            feature = FeatureSchema.model_validate(item)
+        except ValidationError as e:
+            logger.warning("Skipping feature #%d: %s", i + 1, e.errors()[0]["msg"])
+            continue
+        feature.description = feature.description.strip()
+        if feature.description and feature.description.lower() not in seen:
+            seen.add(feature.description.lower())
+            features.append(feature)
 
-        # Process the raw response
-        lines = [line.strip() for line in raw.split('\n') if line.strip()]
-        # Filter out any potential introductory text or examples
-        proposals_text = [line for line in lines if not line.startswith(("*", "-", "#")) and "|" not in line] # Basic filtering
+    if len(features) < n:
+        logger.warning("LLM generated fewer than %d valid proposals. Got %d.", n, len(features))
+    elif len(features) > n:
+        logger.warning("LLM generated more than %d proposals. Taking the first %d.", n, n)
 
-        # Ensure we only take up to 'n' valid proposals
-        proposals = [FeatureProposal(id=i + 1, description=desc) for i, desc in enumerate(proposals_text[:n])]
+    return [FeatureProposal(id=i + 1, **feature.model_dump()) for i, feature in enumerate(features[:n])]
 
-        if len(proposals) < n:
-            logger.warning("LLM generated fewer than %d valid proposals. Got %d. Raw output:\n%s", n, len(proposals), raw)
-        elif len(proposals) > n:
-             logger.warning("LLM generated more than %d proposals. Taking the first %d. Raw output:\n%s", n, n, raw)
-             proposals = proposals[:n] # Trim excess
 
-        logger.info("Feature ideation complete. Generated %d features: %s", len(proposals), [p.description for p in proposals])
-        return proposals
+_FEATURE_INSTRUCTIONS = (
+    "Propose concrete and realistic product features or UX improvements that directly address the pain points "
+    "highlighted in the user feedback clusters. Focus on actionable solutions that enhance user satisfaction.\n"
+    "- Give each feature a short `name` (2-4 words) and a `description` that is a clear, concise imperative statement (e.g., 'Implement a sleep timer', 'Improve playlist organization').\n"
+    "- Ensure the features directly relate to the pain points identified in the cluster keywords and sample feedback, and say which in the one-sentence `rationale`.\n"
+    "- Proposals must be distinct from each other."
+)
 
-    except Exception as e:
-        logger.error("Feature ideation failed: %s", e, exc_info=True)
-        # Return empty list or re-raise depending on desired pipeline behavior
-        return []
+_FEATURE_JSON_FORMAT_EXAMPLE = (
+    '[{"name": "Sleep timer", "description": "Implement a sleep timer that fades out playback", '
+    '"rationale": "Cluster 2 users complain about podcasts playing all night."}, ...]'
+)
 
+_IDEATION_SYSTEM_PROMPT = (
+    "You are a Senior Product Manager at Spotify, specializing in user experience. From the user feedback "
+    "cluster summaries provided, propose exactly the requested number of product features.\n\n"
+    "**Instructions:**\n"
+    f"{_FEATURE_INSTRUCTIONS}\n\n"
+    "**Output:** Return ONLY a valid JSON array of feature objects with the fields name, description and "
+    "rationale, and no text before or after it:\n"
+    f"{_FEATURE_JSON_FORMAT_EXAMPLE}"
+)
 
-# -----------------------------------------------------------------------------
-# 3) Persona Generation
-# -----------------------------------------------------------------------------
 
-def generate_personas(clusters: Dict[str, dict], count: int) -> List[Persona]:
-    """
-    Generates diverse user personas based on cluster data using a single LLM call
-    expecting a JSON output.
-    """
-    if not clusters:
-        logger.warning("No clusters provided for persona generation.")
-        return []
-    if count <= 0:
-        logger.warning("Requested persona count is zero or negative.")
+def ideate_features(selected: Dict[str, dict], n: int = CFG.feature_count) -> List[FeatureProposal]:
+    """Generates feature proposals for all selected clusters with a single LLM call."""
+    logger.info("Starting feature ideation for %d features...", n)
+    if not selected:
+        logger.warning("No clusters selected for feature ideation.")
         return []
 
-    # --- 1. Prepare Cluster Information ---
-    cluster_details_list = []
-    # Select up to 'count' clusters to base personas on, prioritizing as before if needed
-    # (Using simple selection for this example, but could retain sorting)
-    cluster_items = list(clusters.items())
-    num_to_select = min(count, len(cluster_items)) # Aim to base personas on selected clusters
-
-    if num_to_select < count:
-        logger.warning(f"Requested {count} personas, but only {num_to_select} clusters available. Personas might be less diverse or draw inspiration from fewer clusters.")
-    elif num_to_select == 0:
-         logger.warning("No clusters available to generate personas from.")
-         return []
-
-
-    selected_clusters_for_prompt = cluster_items[:num_to_select]
+    cluster_str = _format_cluster_details(selected)
+    if not cluster_str:
+        logger.error("No valid cluster details could be extracted for the feature ideation prompt.")
+        return []
 
-    for cluster_id, cluster_data in selected_clusters_for_prompt:
-        if not isinstance(cluster_data, dict):
-            logger.warning(f"Skipping cluster '{cluster_id}' due to invalid format.")
-            continue
+    prompt = (
+        f"Generate exactly {n} distinct feature proposals as a JSON array.\n\n"
+        f"**User Feedback Clusters:**\n{cluster_str}\n\n"
+        f"Generate the JSON output now."
+    )
 
-        keywords_str = ", ".join(cluster_data.get('keywords', ['N/A']))
-        sentiment_dist = cluster_data.get('sentiment_dist', {})
-        samples = cluster_data.get('samples', [])
-        sample_feedback = samples[0] if samples else 'N/A'
-        sentiment_info = f"SentimentDist=[{', '.join(f'{k}: {v}' for k, v in sentiment_dist.items())}]"
-        if 'avg_sentiment' in cluster_data:
-             sentiment_info += f" | AvgSentiment={cluster_data['avg_sentiment']:.2f}"
+    try:
+        parsed = parse_llm_json(ask_llm(prompt, system_prompt=_IDEATION_SYSTEM_PROMPT), list)
+    except json.JSONDecodeError as e:
+        logger.error("Failed to parse JSON from feature ideation response: %s", e)
+        return []
+    except Exception as e:
+        logger.error("Feature ideation failed: %s", e, exc_info=True)
+        return []
 
-        cluster_details_list.append(
-            f'- Cluster {cluster_id}: Keywords=[{keywords_str}] | {sentiment_info} | Sample="{sample_feedback[:150]}..."'
-        )
+    proposals = _validate_features(parsed, n)
+    logger.info("Feature ideation complete. Generated %d features: %s", len(proposals), [p.description for p in proposals])
+    return proposals
 
-    if not cluster_details_list:
-        logger.error("No valid cluster details could be extracted for persona generation prompt.")
-        return []
 
-    cluster_summary_str = "\\n".join(cluster_details_list)
+# -----------------------------------------------------------------------------
+# 3) Persona Generation
+# -----------------------------------------------------------------------------
 
-    # --- 2. Construct the Prompt for JSON Output ---
-    # Define the JSON structure expected using Persona fields
-    json_format_example = """
+_PERSONA_JSON_FORMAT_EXAMPLE = """
     ```json
     [
       {
@@ -441,289 +702,616 @@ def generate_personas(clusters: Dict[str, dict], count: int) -> List[Persona]:
       }
     ]
     ```
+"""
+
+_PERSONA_REQUIREMENTS = (
+    "1.  **Diversity:** Ensure personas have unique backgrounds, motivations, Spotify usage patterns, and personalities. Avoid stereotypes.\n"
+    "2.  **Grounded in Data:** Each persona's details (background, quote, sentiment, pain points) MUST directly reflect themes from the provided cluster summaries. Assign `inspired_by_cluster_id` to the cluster ID that most influenced the persona.\n"
+    "3.  **Sentiment:** Use ONLY 'positive', 'neutral', or 'negative' for the `sentiment` field.\n"
+    "4.  **Pain Points:** List specific, concrete frustrations or challenges the user faces with Spotify, derived from cluster keywords and feedback.\n"
+)
+
+_PERSONA_SYSTEM_PROMPT = (
+    "You are an expert persona generator specializing in user experience research. Your task is to create exactly the requested number of distinct and deeply grounded Spotify user personas based on the provided user feedback cluster summaries.\n\n"
+    "**Requirements:**\n"
+    f"{_PERSONA_REQUIREMENTS}"
+    "5.  **JSON Output:** Return ONLY a valid JSON list containing the persona objects. Do NOT include any explanatory text before or after the JSON block.\n"
+    "6.  **Format:** Your response MUST be a valid JSON array starting with [ and ending with ]. Each persona object must have all required fields.\n\n"
+    f"**Required JSON Format Example:**\n{_PERSONA_JSON_FORMAT_EXAMPLE}\n\n"
+    "Remember to:\n"
+    "- Start with [\n"
+    "- End with ]\n"
+    "- Include all required fields for each persona\n"
+    "- Do not add any text before or after the JSON\n"
+    "- Ensure the JSON is properly formatted and valid"
+)
+
+
+def _repair_personas(parsed: List[Any], error: ValidationError) -> List[PersonaSchema]:
+    """Makes one repair call for persona JSON that failed validation, then salvages the valid items."""
+    errors = "\n".join(f"- {'.'.join(map(str, err['loc'])) or '<root>'}: {err['msg']}" for err in error.errors())
+    prompt = (
+        "Return ONLY a valid JSON list of persona objects matching this JSON schema:\n"
+        f"{json.dumps(PersonaSchema.model_json_schema())}\n\n"
+        f"The validation errors were:\n{errors}\n\n"
+        f"Original output:\n{json.dumps(parsed, ensure_ascii=False)}"
+    )
+    try:
+        return _PERSONA_LIST_ADAPTER.validate_python(_extract_json(ask_llm(prompt), list))
+    except Exception as e:
+        logger.warning("Persona repair pass failed (%s). Keeping the individually valid personas.", e)
+
+    salvaged: List[PersonaSchema] = []
+    for i, item in enumerate(parsed):
+        try:
+            salvaged.append(PersonaSchema.model_validate(item))
+        except ValidationError as e:
+            logger.warning("Skipping persona #%d: %s", i + 1, e.errors()[0]["msg"])
+    return salvaged
+
+
+def _validate_personas(parsed: Any, count: int) -> List[Persona]:
+    """Validates persona objects parsed from the LLM's JSON and returns at most `count` Personas."""
+    if not isinstance(parsed, list):
+        # Nothing to repair: a repair call would invent personas without the cluster context
+        logger.error("Expected a JSON list of personas, got %s.", type(parsed).__name__)
+        return []
+    try:
+        validated = _PERSONA_LIST_ADAPTER.validate_python(parsed)
+    except ValidationError as e:
+        logger.warning("Persona JSON failed validation (%d errors). Attempting one repair pass.", e.error_count())
+        validated = _repair_personas(parsed, e)
+
+    personas = [Persona(**v.model_dump()) for v in validated]
+
+    validated_count = len(personas)
+    logger.info("Successfully parsed and validated %d personas from LLM response.", validated_count)
+
+    # Check if count matches requested
+    if validated_count < count:
+         logger.warning("LLM generated fewer valid personas (%d) than requested (%d).", validated_count, count)
+    elif validated_count > count:
+         logger.warning("LLM generated more personas (%d) than requested (%d). Truncating to %d.",
+                        validated_count, count, count)
+         personas = personas[:count]
+
+    return personas
+
+
+def generate_personas(clusters: Dict[str, dict], count: int) -> List[Persona]:
+    """
+    Generates diverse user personas based on cluster data using a single LLM call
+    expecting a JSON output.
     """
+    if not clusters:
+        logger.warning("No clusters provided for persona generation.")
+        return []
+    if count <= 0:
+        logger.warning("Requested persona count is zero or negative.")
+        return []
+
+    # --- 1. Prepare Cluster Information ---
+    # Select up to 'count' clusters to base personas on, prioritizing as before if needed
+    # (Using simple selection for this example, but could retain sorting)
+    cluster_items = list(clusters.items())
+    num_to_select = min(count, len(cluster_items)) # Aim to base personas on selected clusters
+
+    if num_to_select < count:
+        logger.warning("Requested %d personas, but only %d clusters available. Personas might be less diverse "
+                       "or draw inspiration from fewer clusters.", count, num_to_select)
+    elif num_to_select == 0:
+         logger.warning("No clusters available to generate personas from.")
+         return []
+
+    cluster_summary_str = _format_cluster_details(dict(cluster_items[:num_to_select]))
+    if not cluster_summary_str:
+        logger.error("No valid cluster details could be extracted for persona generation prompt.")
+        return []
 
+    # --- 2. Construct the Prompt for JSON Output ---
+    # Instructions and format example are static (see _PERSONA_SYSTEM_PROMPT); only the
+    # count and cluster summaries vary, so they go last in the user message.
     prompt = (
-        f"You are an expert persona generator specializing in user experience research. Your task is to create exactly {count} distinct and deeply grounded Spotify user personas based on the provided user feedback cluster summaries.\n\n"
-        f"**Requirements:**\n"
-        f"1.  **Generate {count} Personas:** Create exactly this number.\n"
-        f"2.  **Diversity:** Ensure personas have unique backgrounds, motivations, Spotify usage patterns, and personalities. Avoid stereotypes.\n"
-        f"3.  **Grounded in Data:** Each persona's details (background, quote, sentiment, pain points) MUST directly reflect themes from the provided cluster summaries. Assign `inspired_by_cluster_id` to the cluster ID that most influenced the persona.\n"
-        f"4.  **Sentiment:** Use ONLY 'positive', 'neutral', or 'negative' for the `sentiment` field.\n"
-        f"5.  **Pain Points:** List specific, concrete frustrations or challenges the user faces with Spotify, derived from cluster keywords and feedback.\n"
-        f"6.  **JSON Output:** Return ONLY a valid JSON list containing the persona objects. Do NOT include any explanatory text before or after the JSON block.\n"
-        f"7.  **Format:** Your response MUST be a valid JSON array starting with [ and ending with ]. Each persona object must have all required fields.\n\n"
+        f"Create exactly {count} personas.\n\n"
         f"**Cluster Summaries:**\n{cluster_summary_str}\n\n"
-        f"**Required JSON Format Example:**\n{json_format_example}\n\n"
-        f"Generate the JSON output now. Remember to:\n"
-        f"- Start with [\n"
-        f"- End with ]\n"
-        f"- Include all required fields for each persona\n"
-        f"- Do not add any text before or after the JSON\n"
-        f"- Ensure the JSON is properly formatted and valid"
+        f"Generate the JSON output now."
     )
 
     # --- 3. Call LLM and Parse JSON ---
     personas: List[Persona] = []
     try:
-        raw_response = ask_llm(prompt)
-        logger.debug("Raw LLM response for persona generation: %s", raw_response[:2500] + "...") # Log snippet
-
-        # Clean the response by removing any markdown code fences and whitespace
-        cleaned_response = raw_response.strip()
-        if cleaned_response.startswith("```json"):
-            cleaned_response = cleaned_response[7:]  # Remove ```json
-        if cleaned_response.endswith("```"):
-            cleaned_response = cleaned_response[:-3]  # Remove ```
-        cleaned_response = cleaned_response.strip()
-
-        # Basic validation of JSON structure
-        if not cleaned_response.startswith("[") or not cleaned_response.endswith("]"):
-            logger.error("LLM response does not start with [ or end with ]. Raw response: %s", cleaned_response[:200] + "...")
-            return []
+        raw_response = ask_llm(prompt, system_prompt=_PERSONA_SYSTEM_PROMPT)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Raw LLM response for persona generation: %s...", raw_response[:2500]) # Log snippet
 
+        # Extract the JSON list, ignoring code fences or prose around it
         try:
-            parsed_json = json.loads(cleaned_response)
+            parsed_json = parse_llm_json(raw_response, list)
         except json.JSONDecodeError as e:
-            logger.error("Failed to parse JSON from LLM response. Error: %s. Response: %s", e, cleaned_response[:200] + "...")
+            logger.error("Failed to parse JSON from LLM response. Error: %s. Response: %.200s...", e, raw_response)
             return []
 
         # --- 4. Validate and Instantiate Personas ---
-        validated_count = 0
-        for i, item in enumerate(parsed_json):
-            if not isinstance(item, dict):
-                logger.warning(f"Skipping item #{i+1} in JSON response: not a dictionary.")
-                continue
+        personas = _validate_personas(parsed_json, count)
 
-            # Basic validation (add more checks as needed)
-            required_keys = {"name", "background", "quote", "sentiment", "pain_points", "inspired_by_cluster_id"}
-            if not required_keys.issubset(item.keys()):
-                missing = required_keys - item.keys()
-                logger.warning(f"Skipping persona #{i+1}: Missing required keys: {missing}. Data: {item}")
-                continue
+    except ValueError as e:
+        logger.error("Validation error in parsed JSON: %s", e)
+        return []
+    except Exception as e:
+        logger.error("Error during persona generation LLM call or processing: %s", e, exc_info=True)
+        return [] # Return empty list on failure
 
-            sentiment = item.get("sentiment", "").lower()
-            if sentiment not in ["positive", "neutral", "negative"]:
-                logger.warning(f"Skipping persona '{item.get('name', 'Unknown')}': Invalid sentiment '{item.get('sentiment')}'.")
-                continue
+    # --- 5. Final Check and Return ---
+    if not personas and count > 0:
+         logger.error("Failed to generate any valid personas.")
+
+    return personas
 
-            pain_points = item.get("pain_points", [])
-            if not isinstance(pain_points, list) or not all(isinstance(p, str) for p in pain_points):
-                logger.warning(f"Skipping persona '{item.get('name', 'Unknown')}': Invalid 'pain_points' format (must be list of strings).")
-                continue
 
-            # Cluster ID can be None or string
-            cluster_id = item.get("inspired_by_cluster_id")
-            if cluster_id is not None and not isinstance(cluster_id, str):
-                 # Try to convert if it's a number, otherwise warn
-                 try:
-                     cluster_id = str(cluster_id)
-                 except:
-                      logger.warning(f"Persona '{item.get('name', 'Unknown')}': Invalid 'inspired_by_cluster_id' format ({type(cluster_id)}). Setting to None.")
-                      cluster_id = None
+# -----------------------------------------------------------------------------
+# 3b) Fused Ideation + Persona Generation (one LLM call over the shared cluster context)
+# -----------------------------------------------------------------------------
 
+_IDEATION_AND_PERSONA_SYSTEM_PROMPT = (
+    "You are a Senior Product Manager at Spotify working with an expert UX researcher. From the user feedback "
+    "cluster summaries provided, produce both candidate product features and distinct, deeply grounded user personas "
+    "for a virtual user board.\n\n"
+    "**Feature Requirements:**\n"
+    f"{_FEATURE_INSTRUCTIONS}\n\n"
+    "**Persona Requirements:**\n"
+    f"{_PERSONA_REQUIREMENTS}\n"
+    "**Output:** Return ONLY a valid JSON object with exactly two keys and no text before or after it:\n"
+    '- "features": a JSON list of feature objects with the fields name, description and rationale, e.g.\n'
+    f"{_FEATURE_JSON_FORMAT_EXAMPLE}\n"
+    '- "personas": a JSON list of persona objects, each in this format:\n'
+    f"{_PERSONA_JSON_FORMAT_EXAMPLE}"
+)
 
-            try:
-                personas.append(Persona(
-                    name=str(item["name"]),
-                    background=str(item["background"]),
-                    quote=str(item["quote"]),
-                    sentiment=sentiment,
-                    pain_points=[str(p) for p in pain_points], # Ensure strings
-                    inspired_by_cluster_id=cluster_id
-                ))
-                validated_count += 1
-            except Exception as e: # Catch potential errors during instantiation
-                logger.warning(f"Skipping persona '{item.get('name', 'Unknown')}' due to instantiation error: {e}. Data: {item}")
-                continue
 
-        logger.info(f"Successfully parsed and validated {validated_count} personas from LLM response.")
+def ideate_features_and_personas(selected: Dict[str, dict],
+                                 feature_count: int = CFG.feature_count,
+                                 persona_count: int = CFG.persona_count
+                                 ) -> Tuple[List[FeatureProposal], List[Persona]]:
+    """Generates feature proposals and personas with a single LLM call, sending the cluster context once."""
+    logger.info("Starting fused ideation for %d features and %d personas...", feature_count, persona_count)
+    if not selected:
+        logger.warning("No clusters selected for ideation and persona generation.")
+        return [], []
 
-        # Check if count matches requested
-        if validated_count < count:
-             logger.warning(f"LLM generated fewer valid personas ({validated_count}) than requested ({count}).")
-        elif validated_count > count:
-             logger.warning(f"LLM generated more personas ({validated_count}) than requested ({count}). Truncating to {count}.")
-             personas = personas[:count]
+    cluster_str = _format_cluster_details(selected)
+    if not cluster_str:
+        logger.error("No valid cluster details could be extracted for the fused ideation prompt.")
+        return [], []
 
+    prompt = (
+        f"Propose exactly {feature_count} features and create exactly {persona_count} personas.\n\n"
+        f"**User Feedback Clusters:**\n{cluster_str}\n\n"
+        f"Generate the JSON object now."
+    )
 
+    try:
+        raw_response = ask_llm(prompt, system_prompt=_IDEATION_AND_PERSONA_SYSTEM_PROMPT)
+        parsed = parse_llm_json(raw_response, dict)
     except json.JSONDecodeError as e:
-        logger.error(f"Failed to decode JSON from LLM response: {e}")
-        logger.debug(f"Problematic JSON string: {cleaned_response}")
-        # Optionally raise, or return empty/partial list
-        return []
-    except ValueError as e:
-        logger.error(f"Validation error in parsed JSON: {e}")
-        return []
+        logger.error("Failed to parse JSON from fused ideation response: %s", e)
+        return [], []
     except Exception as e:
-        logger.error(f"Error during persona generation LLM call or processing: {e}", exc_info=True)
-        return [] # Return empty list on failure
+        logger.error("Fused ideation and persona generation failed: %s", e, exc_info=True)
+        return [], []
 
-    # --- 5. Final Check and Return ---
-    if not personas and count > 0:
-         logger.error("Failed to generate any valid personas.")
+    if not isinstance(parsed, dict):
+        logger.error("Expected a JSON object with 'features' and 'personas', got %s.", type(parsed).__name__)
+        return [], []
 
-    return personas
+    features = _validate_features(parsed.get("features"), feature_count)
+    personas = _validate_personas(parsed.get("personas"), persona_count)
+    logger.info("Fused ideation complete. Generated %d features and %d personas.", len(features), len(personas))
+    return features, personas
 
 # -----------------------------------------------------------------------------
 # 4) Board Simulation (Improved with Dynamic Facilitation & LLM Reuse)
 # -----------------------------------------------------------------------------
 
-def simulate_board(personas: Sequence[Persona],
-                   features: Sequence[FeatureProposal],
-                   rounds: int = 3
-                   ) -> Tuple[str, List[BaseMessage]]:
-    """Multi-round virtual board meeting using ConversationChain for each persona."""
-    if not personas or not features:
-        logger.warning("Missing personas (%d) or features (%d)", len(personas), len(features))
-        return "", []
+def _batched_turn_prompt(batch: Sequence[Persona],
+                         memories: Dict[str, BaseChatMemory],
+                         fac_input: str) -> str:
+    """Builds one prompt asking the LLM to answer the facilitator as every persona in `batch`."""
+    rows = []
+    for p in batch:
+        history = get_buffer_string(memories[p.name].load_memory_variables({}).get("history", []))
+        recent = history[-300:].replace("\n", " ") if history else "(none)"
+        rows.append(
+            f"- {p.name} | Background: {p.background} | Sentiment: {p.sentiment} | "
+            f"Pain points: {'; '.join(p.pain_points)} | Recent: {recent}"
+        )
+    persona_rows = "\n".join(rows)
+    return (
+        f"You are simulating {len(batch)} participants of a Spotify user board. "
+        f"Answer the facilitator separately as EACH of the personas below.\n\n"
+        f"**Personas (name | background | sentiment | pain points | recent conversation):**\n"
+        f"{persona_rows}\n\n"
+        f"**Facilitator:** {fac_input}\n\n"
+        f"**Instructions:**\n"
+        f"1. Each response is written in that persona's first person ('I', 'me', 'my'), 1-3 sentences, "
+        f"grounded in their background and pain points. Avoid clichés like 'Honestly' or 'Thanks for bringing this up'.\n"
+        f"2. Personas must not agree by default; keep their voices distinct.\n"
+        f"3. Return ONLY a JSON list with one object per persona: "
+        f'[{{"name": "<persona name>", "response": "<reply>"}}, ...]'
+    )
 
-    logger.info("Initializing ConversationChains for %d personas...", len(personas))
 
-    # Shared LLM for chains
-    llm = LLM # Use the globally defined LLM
+# Facilitator prompts for round 1, round 2 and the final round (any later rounds reuse the last).
+_FACILITATOR_PROMPTS: Tuple[str, ...] = (
+    ("Welcome, everyone. We have **{feature_count}** candidate features (listed above).\n\n"
+     "👉 In a SHORT paragraph: what excites or worries you most?"),
+    ("Thanks! Now dig deeper: for EACH feature name either one concrete risk "
+     "or one success metric. Any initial thoughts on potential impacts?"),
+    ("Time to prioritise. Pick ONE feature Spotify should ship next quarter & why "
+     ". Mention one trade-off you'd accept."),
+)
 
-    # Define a conversational prompt template
-    # Incorporates persona details, history, and current input
-    convo_template = """
-You are {persona_name}. Act and respond authentically based on this profile:
-- Background: {persona_background}
-- Overall Sentiment towards Spotify: {persona_sentiment}
-- Key Pain Points/Frustrations: {persona_pain_points}
 
-Always speak in the first person ('I', 'me', 'my'). Keep your responses concise (1-3 sentences unless asked otherwise) and focused on the discussion topic. Ground your opinions in your background and pain points. Be honest and natural. Avoid clichés like 'Honestly' or 'Thanks for bringing this up'.
+def _facilitator_prompt(r: int, feature_count: int) -> str:
+    return _FACILITATOR_PROMPTS[min(r, len(_FACILITATOR_PROMPTS)) - 1].format(feature_count=feature_count)
 
-Current Conversation:
-{history}
-Human: {input}
-{persona_name}:""" # AI prefix matches persona name for clarity
 
-    prompt = PromptTemplate(
-        input_variables=["history", "input", "persona_name", "persona_background", "persona_sentiment", "persona_pain_points"],
-        template=convo_template
+def _single_pass_prompt(rounds: int, feature_count: int) -> str:
+    """Builds one prompt listing every round's facilitator question for a single persona call."""
+    questions = "\n\n".join(
+        f"Round {r}: {_facilitator_prompt(r, feature_count)}" for r in range(1, rounds + 1))
+    keys = ", ".join(f'"r{r}"' for r in range(1, rounds + 1))
+    return (
+        f"The facilitator will ask the board {rounds} questions in turn. Answer each one as you "
+        f"would at that point in the meeting.\n\n{questions}\n\n"
+        f"Respond with ONLY a JSON object with keys {keys}, each holding your answer to that round."
     )
 
-    # --- Initialize Chains ---
-    chains = {}
-    memories = {}
-    for p in personas:
-        # Create dedicated memory for each agent
-        memory = ConversationBufferWindowMemory(
-            k=5, # Keep last 5 interactions
-            memory_key="history", # Matches prompt variable
-            input_key="input" # Matches prompt variable
-            # ai_prefix=p.name # Optional: match AI prefix in template
-            # human_prefix="Human" # Default
+
+def _is_whole_word(text: str, start: int, end: int) -> bool:
+    """True if text[start:end] is not glued to word characters on either side."""
+    return ((start == 0 or not text[start - 1].isalnum() and text[start - 1] != "_")
+            and (end == len(text) or not text[end].isalnum() and text[end] != "_"))
+
+
+def _vote_matcher(features: Sequence[FeatureProposal]) -> Callable[[str], str | None]:
+    """Returns a function giving the feature description a reply mentions first, if any.
+
+    Matches must sit on word boundaries, so a short name like "ad cap" does not match
+    inside "a bad capability". Uses one Aho–Corasick pass per reply when pyahocorasick
+    is installed.
+    """
+    # Personas often refer to a feature by its short name rather than the full description
+    patterns = {text.lower(): f.description for f in features for text in (f.name, f.description) if text}
+    if not patterns:
+        return lambda reply: None
+    try:
+        import ahocorasick
+    except ImportError:
+        regexes = [(re.compile(rf"(?<!\w){re.escape(pat)}(?!\w)"), desc) for pat, desc in patterns.items()]
+
+        def first_mention(reply: str) -> str | None:
+            reply_lc = reply.lower()
+            # Earliest match end, the order in which the automaton reports matches
+            hits = [(m.end(), desc) for regex, desc in regexes if (m := regex.search(reply_lc))]
+            return min(hits)[1] if hits else None
+        return first_mention
+
+    automaton = ahocorasick.Automaton()
+    for pat, desc in patterns.items():
+        automaton.add_word(pat, (len(pat), desc))
+    automaton.make_automaton()
+
+    def first_mention(reply: str) -> str | None:
+        reply_lc = reply.lower()
+        for end, (length, desc) in automaton.iter(reply_lc): # `end` is the index of the last char
+            if _is_whole_word(reply_lc, end - length + 1, end + 1):
+                return desc
+        return None
+    return first_mention
+
+
+def _new_persona_memory() -> BaseChatMemory:
+    """Creates a persona's conversation memory with a bounded prompt footprint."""
+    from langchain.memory import ConversationBufferWindowMemory, ConversationSummaryBufferMemory
+
+    if CFG.use_summary_memory:
+        # Keeps recent turns verbatim up to the token limit and summarises older ones
+        return ConversationSummaryBufferMemory(
+            llm=_get_memory_summary_llm(),
+            max_token_limit=CFG.summary_memory_token_limit,
+            memory_key="history", # Matches prompt placeholder
+            input_key="input", # Matches prompt variable
+            return_messages=True, # History is rendered as chat messages
         )
-        memories[p.name] = memory
-
-        # Create the ConversationChain
-        chain = ConversationChain(
-            llm=llm,
-            prompt=prompt.partial( # Pre-fill persona details into the prompt
-                persona_name=p.name,
-                persona_background=p.background,
-                persona_sentiment=p.sentiment,
-                persona_pain_points="; ".join(p.pain_points)
-            ),
-            memory=memory,
-            verbose=False # Set to True for debugging chain execution
+    return ConversationBufferWindowMemory(
+        k=CFG.memory_window, # Keep only the last few interactions
+        memory_key="history", # Matches prompt placeholder
+        input_key="input", # Matches prompt variable
+        return_messages=True, # History is rendered as chat messages
+        # ai_prefix=p.name # Optional: match AI prefix in template
+        # human_prefix="Human" # Default
+    )
+
+
+def _persona_static_blocks(persona: Persona, feature_block: str) -> List[str]:
+    """Static system blocks for a persona call, ordered from most to least widely shared."""
+    return [_BOARD_RULES, feature_block, persona.system_prompt]
+
+
+async def _save_turn(memory: BaseChatMemory, persona_name: str, round_input: str, reply: str) -> None:
+    """Records a turn in a persona's memory without letting a memory failure discard the reply.
+
+    Summary memory prunes by calling the summary model (without retries), so saving can fail
+    after a perfectly good reply has been received.
+    """
+    try:
+        await memory.asave_context({"input": round_input}, {"response": reply})
+    except Exception as e:
+        logger.warning("Failed to update memory for %s; keeping the reply: %s", persona_name, e)
+
+
+async def invoke_persona_turn(persona: Persona,
+                              round_input: str,
+                              memory: BaseChatMemory,
+                              feature_block: str) -> str:
+    """Runs one persona turn and records it in the persona's memory.
+
+    Messages are ordered [board rules][feature list][persona profile][history][round input]:
+    the first two blocks are a cacheable prefix shared by every persona, and the profile
+    extends it for this persona's later turns.
+    """
+    history = (await memory.aload_memory_variables({}))["history"]
+    messages = build_messages(
+        _persona_static_blocks(persona, feature_block),
+        [*history, HumanMessage(content=round_input)],
+    )
+    reply = await ainvoke_llm_with_retry(_get_llm(), messages)
+    await _save_turn(memory, persona.name, round_input, reply)
+    return reply
+
+
+async def simulate_board(personas: Sequence[Persona],
+                         features: Sequence[FeatureProposal],
+                         rounds: int = 3
+                         ) -> TranscriptStream:
+    """Multi-round virtual board meeting with one LLM agent (and memory) per persona.
+
+    Personas answer each facilitator prompt independently, so their turns within
+    a round are issued concurrently (bounded by CFG.max_concurrency).
+    """
+    import numpy as np
+
+    if not personas or not features:
+        logger.warning("Missing personas (%d) or features (%d)", len(personas), len(features))
+        return TranscriptStream()
+
+    logger.info("Initializing memories for %d personas...", len(personas))
+
+    # Create dedicated memory for each agent
+    memories: Dict[str, BaseChatMemory] = {p.name: _new_persona_memory() for p in personas}
+
+    # The feature list never changes during the meeting, so it is sent as a static
+    # system block after the persona profile rather than inside the round-1 prompt.
+    feature_list_md = "\n".join(f.md() for f in features)
+    feature_block = f"The board is discussing these {len(features)} candidate Spotify features:\n{feature_list_md}"
+
+    # At most CFG.max_concurrency persona calls in flight at once to avoid 429s
+    semaphore = asyncio.Semaphore(CFG.max_concurrency)
+
+    async def persona_turn(p: Persona, fac_input: str, r: int) -> str:
+        async with semaphore:
+            logger.info("Simulating turn for persona %s in round %d", p.name, r)
+            return await invoke_persona_turn(p, fac_input, memories[p.name], feature_block)
+
+    async def batched_turn(batch: Sequence[Persona], fac_input: str, r: int) -> List[str | Exception]:
+        async with semaphore:
+            logger.info("Simulating batched turn for %s in round %d", [p.name for p in batch], r)
+            raw = await ainvoke_llm_with_retry(_get_llm(), build_messages(
+                [feature_block], [HumanMessage(content=_batched_turn_prompt(batch, memories, fac_input))]))
+        parsed = _extract_json(raw, list) # No repair pass: a failed batch falls back per persona
+        if not isinstance(parsed, list):
+            raise ValueError("Batched persona reply is not a JSON list.")
+        by_name = {str(item.get("name")): str(item.get("response", ""))
+                   for item in parsed if isinstance(item, dict)}
+
+        results: List[str | Exception] = []
+        for p in batch:
+            reply = by_name.get(p.name)
+            if reply is None:
+                results.append(ValueError(f"No response for {p.name} in batched reply."))
+                continue
+            # Keep each persona's memory in sync with the per-persona mode
+            await _save_turn(memories[p.name], p.name, fac_input, reply)
+            results.append(reply)
+        return results
+
+    async def single_pass_answers(p: Persona) -> Dict[str, Any]:
+        async with semaphore:
+            logger.info("Simulating all %d rounds for persona %s in one call", rounds, p.name)
+            raw = await ainvoke_llm_with_retry(_get_llm(), build_messages(
+                _persona_static_blocks(p, feature_block),
+                [HumanMessage(content=_single_pass_prompt(rounds, len(features)))]))
+        parsed = _extract_json(raw, dict)
+        if not isinstance(parsed, dict):
+            raise ValueError(f"Single-pass reply for {p.name} is not a JSON object.")
+        return parsed
+
+    # In single-pass mode every persona's answers for all rounds are fetched up front
+    single_pass: Dict[str, Dict[str, Any] | Exception] = {}
+    if CFG.board_mode == "single_pass":
+        results = await asyncio.gather(*(single_pass_answers(p) for p in personas), return_exceptions=True)
+        single_pass = {p.name: result for p, result in zip(personas, results)}
+
+    def single_pass_reply(p: Persona, r: int) -> str | Exception:
+        answers = single_pass[p.name]
+        if isinstance(answers, Exception):
+            return answers
+        reply = answers.get(f"r{r}")
+        if not isinstance(reply, str):
+            return ValueError(f"No round {r} answer for {p.name} in single-pass reply.")
+        return reply
+
+    async def round_replies(order: Sequence[Persona], fac_input: str, r: int) -> List[str | Exception]:
+        if CFG.board_mode == "single_pass":
+            return [single_pass_reply(p, r) for p in order]
+        if CFG.board_mode != "batched":
+            return await asyncio.gather(
+                *(persona_turn(p, fac_input, r) for p in order), return_exceptions=True
+            )
+        size = max(1, CFG.persona_batch_size)
+        batches = [order[i:i + size] for i in range(0, len(order), size)]
+        batch_results = await asyncio.gather(
+            *(batched_turn(batch, fac_input, r) for batch in batches), return_exceptions=True
         )
-        chains[p.name] = chain
-        logger.debug("Initialized ConversationChain for %s", p.name)
+        replies: List[str | Exception] = []
+        for batch, result in zip(batches, batch_results):
+            # A failed batch marks every persona in it as failed
+            replies.extend([result] * len(batch) if isinstance(result, Exception) else result)
+        return replies
 
     # --- Simulation Setup ---
-    feature_list_md = "\n".join(
-        f"{i+1}. {f.description}" for i, f in enumerate(features))
-
-    transcript: List[str] = [] # Initialize empty list
-    # Overall history tracking (distinct from agent memory)
-    global_history: List[BaseMessage] = []
+    transcript = TranscriptStream()
     # Use description as the key for votes
-    priority_votes: defaultdict[str, int] = defaultdict(int)
+    priority_votes: Counter[str] = Counter()
+    voted_feature = _vote_matcher(features) # Built once, outside the round loop
 
     # --- Simulation Loop ---
     for r in range(1, rounds + 1):
         logger.info("--- Starting Discussion Round %d ---", r)
         # ---- facilitator prompt ----
+        fac_input = _facilitator_prompt(r, len(features))
+
+        transcript.append(f"\n### 🎤 Facilitator – Round {r}")
         if r == 1:
-            fac_input = (f"Welcome, everyone. We have **{len(features)}** candidate features:\n"
-                   f"{feature_list_md}\n\n"
-                   "👉 In a SHORT paragraph: what excites or worries you most?")
-        elif r == 2:
-            fac_input = ("Thanks! Now dig deeper: for EACH feature name either one concrete risk "
-                   "or one success metric. Any initial thoughts on potential impacts?")
-        else:  # final
-            fac_input = ("Time to prioritise. Pick ONE feature Spotify should ship next quarter & why "
-                   ". Mention one trade-off you'd accept.")
-
-        transcript += [f"\n### 🎤 Facilitator – Round {r}", fac_input]
-        # Add facilitator turn to global history (important for context if not using shared memory)
-        global_history.append(HumanMessage(content=fac_input))
-
-        order = list(personas)
-        random.shuffle(order)
-
-        for p in order:
-            logger.info("Simulating turn for persona %s in round %d", p.name, r)
-            chain = chains[p.name]
+            transcript.append(feature_list_md) # Readers and the summariser still see the features
+        transcript.append(fac_input)
 
-            try:
-                # Run the chain - it uses its internal memory for history
-                reply = chain.predict(input=fac_input)
-                reply = reply.strip() # Clean up whitespace
+        order = [personas[i] for i in np.random.permutation(len(personas))]
 
-            except Exception as e:
-                logger.error("ConversationChain execution failure for %s, round %d: %s", p.name, r, e, exc_info=True)
+        # All personas see the same facilitator prompt and have independent memories
+        replies = await round_replies(order, fac_input, r)
+
+        # Record replies in the shuffled speaking order
+        matched: List[str] = []
+        for p, reply in zip(order, replies):
+            if isinstance(reply, Exception):
+                logger.error("Persona turn failure for %s, round %d: %s", p.name, r, reply)
                 reply = "(Persona encountered an error and could not generate response)"
+            else:
+                reply = reply.strip() # Clean up whitespace
 
             # Record persona's reply
-            transcript += [f"\n#### 👤 {p.name}", reply]
-            # Add agent's reply to global history
-            global_history.append(AIMessage(content=reply))
+            transcript.append(f"\n#### 👤 {p.name}", reply)
 
             # Tally votes in the last round (using description)
-            if r == rounds:
-                for f in features:
-                    if f.description.lower() in reply.lower():
-                        priority_votes[f.description] += 1
-                        logger.debug("Vote tallied for '%s' from %s", f.description, p.name)
-                        break # Count first match only
+            if r == rounds and (desc := voted_feature(reply)) is not None:
+                matched.append(desc) # Count first match only
+                logger.debug("Vote tallied for '%s' from %s", desc, p.name)
+        priority_votes.update(matched)
 
     # transcript.append("```")   # Removed: Don't add markdown fence here
-    final_transcript_md = "\n".join(transcript)
-    logger.info("Board simulation done – %d messages in global history", len(global_history))
-
-    # Return the formatted transcript and the global message history
-    return final_transcript_md, global_history
+    logger.info("Board simulation done – %d rounds with %d personas", rounds, len(personas))
+    logger.info("Final-round priority votes: %s", priority_votes.most_common())
+    return transcript
 
 # -----------------------------------------------------------------------------
 # 5) Meeting Summary
 # -----------------------------------------------------------------------------
 
-def summarise_meeting(transcript_md: str, conversation_history: List[BaseMessage] | None = None) -> str:
-    """Summarizes the virtual board meeting transcript using an LLM."""
+_SUMMARY_SECTIONS = (
+    "Your summary MUST include these sections in markdown format:\n\n"
+    "1.  **Pros & Cons per Feature:** For each proposed feature, list the key advantages (Pros) and disadvantages or concerns (Cons) raised by the participants. Be specific.\n"
+    "2.  **Overall Sentiment & Key Takeaways per Persona:** Briefly describe each persona's overall stance, highlighting their main points, priorities, or key concerns.\n"
+    "3.  **Points of Agreement & Disagreement:** Note any areas where personas strongly agreed or disagreed with each other.\n"
+    "4.  **Final Recommendation:** Provide a concise (1-3 sentences) go/no-go/conditional recommendation for the features, explicitly mentioning the rationale based on the discussion (e.g., priority, concerns raised).\n\n"
+)
+_SUMMARY_HEADER = (
+    "You are an expert meeting summarizer. Analyze the virtual user board meeting transcript provided below.\n"
+    f"{_SUMMARY_SECTIONS}"
+    "---\n"
+)
+_SUMMARY_FOOTER = (
+    "\n---\n"
+    "Generate the summary now."
+)
+
+
+# Map-reduce path for long transcripts: summarise each persona's thread, then combine
+_SUMMARY_MAP_PROMPT = (
+    "You are an expert meeting summarizer. Below are one participant's replies from a virtual user board "
+    "meeting about candidate Spotify features, labelled by round. Summarize this persona's stance and feature "
+    "votes in 3-5 bullet points: their view of each feature (pros, cons, risks or metrics raised) and which "
+    "feature they prioritised in the final round and why."
+)
+_SUMMARY_REDUCE_HEADER = (
+    "You are an expert meeting summarizer. The virtual user board meeting below was too long to include "
+    "verbatim, so it is given as the facilitator's questions followed by a summary of each persona's contributions.\n"
+    f"{_SUMMARY_SECTIONS}"
+    "---\n"
+)
+_PERSONA_HEADING = "\n#### 👤 "
+_FACILITATOR_HEADING = "\n### 🎤 "
+
+
+def _split_transcript_by_persona(transcript_md: str) -> Tuple[str, Dict[str, List[str]]]:
+    """Splits a board transcript into the facilitator turns and each persona's round-labelled replies."""
+    facilitator_turns: List[str] = []
+    threads: Dict[str, List[str]] = defaultdict(list)
+    round_label = ""
+    for i, piece in enumerate(transcript_md.split(_PERSONA_HEADING)):
+        reply, _, facilitator = piece.partition(_FACILITATOR_HEADING)
+        if i > 0:
+            name, _, text = reply.partition("\n")
+            threads[name.strip()].append(f"[{round_label}] {text.strip()}")
+        if facilitator:
+            facilitator_turns.append(f"### {facilitator.strip()}")
+            # e.g. "Facilitator – Round 2"; labels the replies that follow it
+            round_label = facilitator.partition("\n")[0].strip()
+    return "\n\n".join(facilitator_turns), threads
+
+
+async def _map_reduce_summary(transcript_md: str) -> str:
+    """Summarises each persona's thread in parallel, then combines the micro-summaries."""
+    facilitator_md, threads = _split_transcript_by_persona(transcript_md)
+    logger.info("Transcript is %d chars; summarising %d persona threads first.", len(transcript_md), len(threads))
+
+    semaphore = asyncio.Semaphore(CFG.max_concurrency)
+
+    async def summarise_thread(name: str, replies: List[str]) -> str:
+        async with semaphore:
+            return await aask_llm(f"Persona: {name}\n\n" + "\n\n".join(replies),
+                                  system_prompt=_SUMMARY_MAP_PROMPT)
+
+    names = list(threads)
+    results = await asyncio.gather(*(summarise_thread(n, threads[n]) for n in names), return_exceptions=True)
+    sections = []
+    for name, result in zip(names, results):
+        if isinstance(result, Exception):
+            # One failed thread should not sink the whole summary; reduce over its raw replies instead
+            logger.warning("Micro-summary failed for %s; using raw replies: %s", name, result)
+            result = "(Raw replies, summary unavailable)\n" + "\n".join(threads[name])
+        sections.append(f"#### {name}\n{result}")
+    persona_sections = "\n\n".join(sections)
+    return await aask_llm(_SUMMARY_REDUCE_HEADER + facilitator_md + "\n\n" + persona_sections + _SUMMARY_FOOTER)
+
+
+async def summarise_meeting(transcript_md: str) -> str:
+    """Summarizes the virtual board meeting transcript using an LLM.
+
+    Transcripts over CFG.summary_map_reduce_chars are map-reduced per persona to stay
+    well inside the context window.
+    """
     logger.info("Generating meeting summary...")
-    if not transcript_md.strip():
+    if not transcript_md or transcript_md.isspace(): # No stripped copy of the transcript
         logger.warning("Transcript is empty, cannot generate summary.")
         return "Error: Transcript was empty."
 
-    # Use the detailed prompt provided previously
-    prompt = (
-        "You are an expert meeting summarizer. Analyze the virtual user board meeting transcript provided below.\n"
-        "Your summary MUST include these sections in markdown format:\n\n"
-        "1.  **Pros & Cons per Feature:** For each proposed feature, list the key advantages (Pros) and disadvantages or concerns (Cons) raised by the participants. Be specific.\n"
-        "2.  **Overall Sentiment & Key Takeaways per Persona:** Briefly describe each persona's overall stance, highlighting their main points, priorities, or key concerns.\n"
-        "3.  **Points of Agreement & Disagreement:** Note any areas where personas strongly agreed or disagreed with each other.\n"
-        "4.  **Final Recommendation:** Provide a concise (1-3 sentences) go/no-go/conditional recommendation for the features, explicitly mentioning the rationale based on the discussion (e.g., priority, concerns raised).\n\n"
-        "---\n"
-        f"{transcript_md}\n" # Embed the full transcript directly
-        "---\n"
-        "Generate the summary now."
-    )
-
     try:
-        summary = ask_llm(prompt)
+        if len(transcript_md) > CFG.summary_map_reduce_chars:
+            summary = await _map_reduce_summary(transcript_md)
+        else:
+            # Embed the full transcript directly between the static header and footer
+            summary = await aask_llm(_SUMMARY_HEADER + transcript_md + _SUMMARY_FOOTER)
         logger.info("Meeting summary generated successfully.")
         return summary
     except Exception as e:
@@ -735,11 +1323,15 @@ def summarise_meeting(transcript_md: str, conversation_history: List[BaseMessage
 # 6) Report Writer (Simplified Transcript Handling)
 # -----------------------------------------------------------------------------
 
+# Canonical display order for sentiment labels; any other labels follow in their original order
+_SENTIMENT_ORDER = ("negative", "neutral", "positive")
+
+
 def write_report(
     selected_clusters: Dict[str, dict],
     features: Sequence[FeatureProposal],
     personas: Sequence[Persona],
-    transcript: str, # Expect pre-formatted Markdown transcript
+    transcript: TranscriptStream, # Pre-formatted Markdown transcript lines
     summary: str
 ):
     """Writes the final Markdown report to the output directory."""
@@ -748,7 +1340,9 @@ def write_report(
     logger.info("Writing final report to: %s", report_path)
 
     try:
-        with report_path.open("w", encoding="utf-8") as f:
+        # One large buffer: the many small writes below only hit disk a few times,
+        # and transcript lines are streamed in without building the whole report in memory
+        with report_path.open("w", encoding="utf-8", buffering=1 << 16) as f:
             # --- Header ---
             f.write("# 🎵 Spotify Virtual User-Board Session\n\n")
             f.write(f"*Generated on {ts}*\n\n")
@@ -762,18 +1356,20 @@ def write_report(
             # Sort clusters by ID for consistent report order
             for cluster_id, cluster_data in sorted(selected_clusters.items(), key=lambda item: str(item[0])):
                 f.write(f"### Cluster {cluster_id}\n\n")
-                keywords = cluster_data.get('keywords', [])
-                f.write(f"- **Keywords**: {', '.join(keywords)}\n")
+                keywords_str = ', '.join(cluster_data.get('keywords', []))
+                f.write(f"- **Keywords**: {keywords_str}\n")
                 sentiment_dist = cluster_data.get('sentiment_dist', {})
                 f.write("- **Sentiment Distribution**:\n")
-                # Sort sentiment labels for consistent order
-                for sentiment, count in sorted(sentiment_dist.items()):
-                    f.write(f"  - {sentiment.capitalize()}: {count}\n")
+                # Fixed label order instead of sorting each cluster's labels
+                labels = [label for label in _SENTIMENT_ORDER if label in sentiment_dist]
+                labels += [label for label in sentiment_dist if label not in _SENTIMENT_ORDER]
+                for sentiment in labels:
+                    f.write(f"  - {sentiment.capitalize()}: {sentiment_dist[sentiment]}\n")
                 f.write("- **Sample Feedback**:\n")
                 samples = cluster_data.get('samples', [])
-                for sample in samples[:2]: # Show top 2 samples
+                for sample in islice(samples, 2): # Show top 2 samples without copying the list
                     # Clean sample for display (remove extra whitespace)
-                    cleaned_sample = re.sub(r'\s+', ' ', str(sample)).strip()
+                    cleaned_sample = ' '.join(str(sample).split())
                     f.write(f"  > {cleaned_sample}\n")
                 f.write("\n")
 
@@ -782,6 +1378,8 @@ def write_report(
             if features:
                 for feat in features:
                     f.write(f"### {feat.md()}\n\n")
+                    if feat.rationale:
+                        f.write(f"*Rationale*: {feat.rationale}\n\n")
             else:
                 f.write("*No features were generated.*\n\n")
 
@@ -795,12 +1393,14 @@ def write_report(
             else:
                 f.write("*No personas were generated.*\n\n")
 
-            # --- Discussion Transcript (Write pre-formatted string directly) ---
+            # --- Discussion Transcript (Write pre-formatted lines directly) ---
             f.write("## 💬 Discussion Transcript\n\n")
-            if transcript.strip():
+            if transcript:
                  # Wrap the transcript content in a markdown code block
                  f.write("```markdown\n")
-                 f.write(transcript + "\n")
+                 for line in transcript.lines():
+                     f.write(line)
+                     f.write("\n")
                  f.write("```\n\n")
             else:
                  f.write("*No discussion transcript was generated.*\n\n")
@@ -818,12 +1418,12 @@ def write_report(
             f.write("\n---\n")
             f.write("*This report was generated using an AI-powered user board simulation pipeline.*\n")
 
-        logger.info("Markdown report written successfully.")
+        logger.info("Markdown report written successfully (%d bytes).", report_path.stat().st_size)
 
     except IOError as e:
-        logger.error("Failed to write report file %s: %s", report_path, e, exc_info=True)
+        logger.error("Failed to write report file %s: %s", report_path, e)
     except Exception as e:
-        logger.error("An unexpected error occurred during report writing: %s", e, exc_info=True)
+        logger.error("An unexpected error occurred during report writing: %s", e)
 
 
 # -----------------------------------------------------------------------------
@@ -832,55 +1432,71 @@ def write_report(
 
 def build_pipeline():
     """Builds the LangGraph StateGraph pipeline."""
+    from langgraph.graph import END, StateGraph
+
     logger.info("Building LangGraph pipeline...")
     graph = StateGraph(AgentState) # Use the typed state
 
     # Define node functions that update the state
+    def run_ideation_and_personas(state: AgentState) -> Dict[str, Any]:
+        try:
+            features, personas = ideate_features_and_personas(
+                state["selected_clusters"], CFG.feature_count, CFG.persona_count)
+            return {"features": features, "personas": personas, "error": None}
+        except Exception as e:
+            logger.error("Error in ideation/persona generation node: %s", e)
+            return {"error": f"Ideation and Persona Generation Failed: {e}"}
+
+    # Used instead of the fused node when CFG.fuse_ideation_and_personas is off
     def run_feature_ideation(state: AgentState) -> Dict[str, Any]:
         try:
-            features = ideate_features(state["selected_clusters"], CFG.feature_count)
-            return {"features": features, "error": None}
+            return {"features": ideate_features(state["selected_clusters"], CFG.feature_count)}
         except Exception as e:
-            logger.error("Error in feature ideation node: %s", e, exc_info=True)
+            logger.error("Error in feature ideation node: %s", e)
             return {"error": f"Feature Ideation Failed: {e}"}
 
     def run_persona_generation(state: AgentState) -> Dict[str, Any]:
-        if state.get("error"): return {} # Skip if previous step failed
         try:
-            personas = generate_personas(state["selected_clusters"], CFG.persona_count)
-            return {"personas": personas, "error": None}
+            return {"personas": generate_personas(state["selected_clusters"], CFG.persona_count)}
         except Exception as e:
-            logger.error("Error in persona generation node: %s", e, exc_info=True)
+            logger.error("Error in persona generation node: %s", e)
             return {"error": f"Persona Generation Failed: {e}"}
 
-    def run_board_simulation(state: AgentState) -> Dict[str, Any]:
+    async def run_board_simulation(state: AgentState) -> Dict[str, Any]:
         if state.get("error"): return {} # Skip if previous step failed
         try:
-            transcript_md, history = simulate_board(state["personas"], state["features"], CFG.discussion_rounds)
-            return {"transcript": transcript_md, "conversation_history": history, "error": None}
+            transcript = await simulate_board(state["personas"], state["features"], CFG.discussion_rounds)
+            return {"transcript": transcript, "error": None}
         except Exception as e:
-            logger.error("Error in board simulation node: %s", e, exc_info=True)
+            logger.error("Error in board simulation node: %s", e)
             return {"error": f"Board Simulation Failed: {e}"}
 
-    def run_summary_generation(state: AgentState) -> Dict[str, Any]:
+    async def run_summary_generation(state: AgentState) -> Dict[str, Any]:
         if state.get("error"): return {} # Skip if previous step failed
         try:
-            summary = summarise_meeting(state["transcript"], state["conversation_history"])
+            transcript_md = "\n".join(state["transcript"].lines()) # Materialised only for the prompt
+            summary = await summarise_meeting(transcript_md)
             return {"summary": summary, "error": None}
         except Exception as e:
-            logger.error("Error in summary generation node: %s", e, exc_info=True)
+            logger.error("Error in summary generation node: %s", e)
             return {"error": f"Summary Generation Failed: {e}"}
 
     # Add nodes to the graph
-    graph.add_node("ideate", run_feature_ideation)
-    graph.add_node("generate_personas", run_persona_generation)
     graph.add_node("board", run_board_simulation)
     graph.add_node("generate_summary", run_summary_generation)
 
-    # Define edges - standard sequential flow
-    graph.set_entry_point("ideate")
-    graph.add_edge("ideate", "generate_personas")
-    graph.add_edge("generate_personas", "board")
+    # Define edges - sequential flow after the board's inputs are ready
+    if CFG.fuse_ideation_and_personas:
+        graph.add_node("ideate_and_personas", run_ideation_and_personas)
+        graph.set_entry_point("ideate_and_personas")
+        graph.add_edge("ideate_and_personas", "board")
+    else:
+        # Both only read selected_clusters, so they run as parallel branches that join at the board
+        graph.add_node("ideate", run_feature_ideation)
+        graph.add_node("generate_personas", run_persona_generation)
+        graph.set_entry_point("ideate")
+        graph.set_entry_point("generate_personas")
+        graph.add_edge(["ideate", "generate_personas"], "board")
     graph.add_edge("board", "generate_summary")
     graph.add_edge("generate_summary", END)
 
@@ -893,13 +1509,14 @@ def build_pipeline():
 # Main entrypoint
 # -----------------------------------------------------------------------------
 
-def main() -> None:
+async def main() -> None:
     """Main function to load data, build and run the pipeline, and write the report."""
+    configure_logging()
+
     # Apply random seed early if specified
     if CFG.random_seed is not None:
-         random.seed(CFG.random_seed)
-         np.random.seed(CFG.random_seed) # Seed numpy as well
-         # torch seeding can be added here if needed, see notes above
+         import numpy as np
+         np.random.seed(CFG.random_seed) # Speaking order shuffle; the LLM clients get the seed directly
          logger.info("Using random seed: %d", CFG.random_seed)
 
     try:
@@ -919,14 +1536,13 @@ def main() -> None:
             "selected_clusters": selected_clusters_data,
             "features": [],
             "personas": [],
-            "transcript": "",
-            "conversation_history": [],
+            "transcript": TranscriptStream(),
             "summary": "",
             "error": None # Initialize error state
         }
 
         logger.info("Invoking pipeline...")
-        final_state = pipeline.invoke(initial_state)
+        final_state = await pipeline.ainvoke(initial_state)
         logger.info("Pipeline invocation complete.")
 
         # --- Error Check ---
@@ -941,7 +1557,7 @@ def main() -> None:
             final_state.get("selected_clusters", selected_clusters_data), # Use initial if final missing
             final_state.get("features", []),
             final_state.get("personas", []),
-            final_state.get("transcript", "*Transcript generation failed or skipped due to error.*"),
+            final_state.get("transcript", TranscriptStream()), # Reported as "no transcript" if missing
             final_state.get("summary", f"*Summary generation failed or skipped. Error: {final_state.get('error')}*")
         )
 
@@ -966,4 +1582,4 @@ def main() -> None:
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    asyncio.run(main())
\ No newline at end of file